@@ -6,17 +6,33 @@ Remove a user (by email) from a Terraform Cloud / Enterprise Team.
 Requires:
  - TFE_TOKEN environment variable (API token)
  - TFE_HOST optional (default: https://app.terraform.io)
+ - TFE_TEAMS_CACHE_TTL optional, seconds to reuse the on-disk teams listing (default: 0, disabled)
 
 Usage:
 python main.py --org my-org --team "Team Name" --email user@example.com 
 """
 import os
 import sys
+import json
+import math
 import argparse
+import atexit
+import functools
+import tempfile
+from urllib.parse import urlparse, quote_plus
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
+
+# orjson parses API responses several times faster when installed; fall back to the stdlib
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 logger = logging.getLogger(__name__)
 if not logger.handlers:
@@ -39,6 +55,28 @@ if not TOKEN:
     print("Error: TFE_TOKEN environment variable is required.", file=sys.stderr)
     sys.exit(1)
 
+# Size of the connection pool shared by concurrent requests to TFE
+MAX_WORKERS  = 16
+# Concurrent page fetches when walking a paginated collection
+PAGE_WORKERS = 8
+# Page size (and emails per filter) when listing organization-memberships (TFE maximum)
+MEMBERSHIPS_PAGE_SIZE = 100
+# Retries of the bulk delete when TFE answers 429 Too Many Requests
+RATE_LIMIT_RETRIES = 3
+
+# Optional on-disk cache of the org teams listing, reused across runs for TEAMS_CACHE_TTL seconds
+try:
+    TEAMS_CACHE_TTL = float(os.environ.get("TFE_TEAMS_CACHE_TTL") or 0)
+except ValueError:
+    TEAMS_CACHE_TTL = None
+if TEAMS_CACHE_TTL is None or not math.isfinite(TEAMS_CACHE_TTL):
+    print("Error: TFE_TEAMS_CACHE_TTL must be a number of seconds (e.g., 60).", file=sys.stderr)
+    sys.exit(1)
+TEAMS_CACHE_DIR = os.path.join(
+    os.environ.get("TFE_TEAMS_CACHE_DIR") or os.path.expanduser("~/.cache/tfe-teams"),
+    urlparse(TFE_HOST).netloc or "default",
+)
+
 HEADERS = {
     "Authorization": f"Bearer {TOKEN}",
     "Content-Type": "application/vnd.api+json",
@@ -46,21 +84,178 @@ HEADERS = {
 }
 
 
-### step 1: function used to get all teams in the org
-def get_org_teams(org):
-    """Return list of teams in the organization."""
-    url = f"{API_BASE}/organizations/{org}/teams"
-    teams = []
+def build_session():
+    """Return a requests.Session with auth headers and a keep-alive connection pool."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS))
+    return session
+
+
+# Default session for helpers called without one; main() manages its own.
+# Every call on a session reuses the same TCP/TLS connections.
+SESSION = build_session()
+atexit.register(SESSION.close)
+
+
+def _get_json(url, session=None):
+    """GET url and return the decoded JSON body, raising for HTTP errors."""
+    resp = (session or SESSION).get(url)
+    resp.raise_for_status()
+    return _loads(resp.content)
+
+
+def _get_all_pages(url, page_size=None, session=None, pool=None):
+    """Return the `data` items of every page of a JSON:API collection.
+
+    The first page is fetched on its own; when it carries meta.pagination the
+    remaining pages are requested concurrently (on `pool` if given, else a
+    short-lived executor) and appended in page order.
+    Otherwise the links.next chain is followed serially.
+    """
+    get_json = functools.partial(_get_json, session=session)
+    sep   = "&" if "?" in url else "?"
+    data  = get_json(f"{url}{sep}page[size]={page_size}" if page_size else url)
+    items = list(data.get("data", []))
+
+    pagination  = (data.get("meta", {}) or {}).get("pagination", {}) or {}
+    total_pages = pagination.get("total-pages")
+    page_size   = pagination.get("page-size") or page_size
+    if total_pages and page_size:
+        urls = [f"{url}{sep}page[number]={n}&page[size]={page_size}" for n in range(2, total_pages + 1)]
+        if urls and pool is not None:
+            pages = pool.map(get_json, urls)
+        elif urls:
+            with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, len(urls))) as page_pool:
+                pages = list(page_pool.map(get_json, urls))
+        else:
+            pages = []
+        for page in pages:
+            items.extend(page.get("data", []))
+        return items
+
+    url = data.get("links", {}).get("next")
     while url:
-        resp = requests.get(url, headers=HEADERS)
-        resp.raise_for_status()
-        data = resp.json()
-        teams.extend(data.get("data", []))
-        url = data.get("links", {}).get("next")
-    return teams
+        data = get_json(url)
+        items.extend(data.get("data", []))
+        url  = data.get("links", {}).get("next")
+    return items
+
+
+def _teams_cache_path(org):
+    return os.path.join(TEAMS_CACHE_DIR, f"{org}.json")
+
+
+def _read_teams_cache(org):
+    """Return the cached teams listing for org, or None if missing, stale or disabled."""
+    if TEAMS_CACHE_TTL <= 0:
+        return None
+    path = _teams_cache_path(org)
+    try:
+        if time.time() - os.path.getmtime(path) >= TEAMS_CACHE_TTL:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_teams_cache(org, teams):
+    """Atomically store the teams listing for org; failures are ignored."""
+    if TEAMS_CACHE_TTL <= 0:
+        return
+    try:
+        os.makedirs(TEAMS_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TEAMS_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(teams, f)
+        os.replace(tmp_path, _teams_cache_path(org))
+    except OSError:
+        pass
+
+
+# In-process memo of the teams listing and its name index, keyed on org only
+_ORG_TEAMS         = {}
+_ORG_TEAMS_BY_NAME = {}
+
+
+def invalidate_org_teams_cache(org):
+    """Drop the in-process and on-disk teams listing for org."""
+    _ORG_TEAMS.pop(org, None)
+    _ORG_TEAMS_BY_NAME.pop(org, None)
+    try:
+        os.remove(_teams_cache_path(org))
+    except OSError:
+        pass
+
+
+def _fetch_org_teams(org, session=None, pool=None):
+    """Fetch the teams listing for org from TFE, trimmed with _team_summary."""
+    url = f"{API_BASE}/organizations/{org}/teams"
+    return [_team_summary(t) for t in _get_all_pages(url, session=session, pool=pool)]
+
+
+### step 1: function used to get all teams in the org
+def get_org_teams(org, session=None, pool=None):
+    """Return list of teams in the organization.
+
+    Each team is trimmed to id, name, users-count and visibility. Memoized
+    per org (whatever session/pool is passed) for the lifetime of the process
+    and, when TFE_TEAMS_CACHE_TTL is set, persisted to disk for reuse across runs.
+    Returns a new list on each call; the team dicts in it are shared with the
+    memo and must not be modified.
+    """
+    teams = _ORG_TEAMS.get(org)
+    if teams is None:
+        teams = _read_teams_cache(org)
+        if teams is None:
+            teams = _fetch_org_teams(org, session, pool)
+            _write_teams_cache(org, teams)
+        _ORG_TEAMS[org] = teams
+    return list(teams)
+
+
+def get_org_teams_by_name(org, session=None, pool=None):
+    """Return {team name: team} for the organization, built once per listing."""
+    by_name = _ORG_TEAMS_BY_NAME.get(org)
+    if by_name is None:
+        by_name = {t["attributes"]["name"]: t for t in get_org_teams(org, session, pool)}
+        _ORG_TEAMS_BY_NAME[org] = by_name
+    return by_name
+
+
+def get_team_by_name(org, name, session=None, pool=None):
+    """Return the team named `name` in the organization, or None.
+
+    Asks TFE for that single team via filter[names]. An empty result means
+    the filter was applied and the team does not exist. Rows without an exact
+    match mean the server ignored the filter, so the full teams listing is
+    searched instead.
+    """
+    url   = f"{API_BASE}/organizations/{org}/teams?filter[names]={quote_plus(name)}&page[size]=1"
+    teams = _get_json(url, session).get("data", [])
+    if not teams:
+        return None
+    for t in teams:
+        if (t.get("attributes", {}) or {}).get("name") == name:
+            return _team_summary(t)
+    return get_org_teams_by_name(org, session, pool).get(name)
+
+
+def _team_summary(t):
+    """Reduce a team resource to the fields this script reads."""
+    attrs = t.get("attributes", {}) or {}
+    return {
+        "id": t.get("id"),
+        "attributes": {
+            "name": attrs.get("name"),
+            "users-count": attrs.get("users-count"),
+            "visibility": attrs.get("visibility"),
+        },
+    }
 
 ### step 2: function to find user and collect all their team IDs
-def find_user_and_team(org, email):
+def find_user_and_team(org, email, session=None):
     """Search organization-memberships by email and collect identifiers for next steps.
 
     Steps:
@@ -73,29 +268,79 @@ def find_user_and_team(org, email):
 
     Returns a tuple (org_membership_id, user_id, team_ids) or (None, None, [])
     """
-    import urllib.parse
-
     # Retrieve user data by quering organization-memberships with email
-    q      = urllib.parse.quote_plus(email)
+    q      = quote_plus(email)
     url    = f"{API_BASE}/organizations/{org}/organization-memberships?q={q}"
-    resp   = requests.get(url, headers=HEADERS)
-    resp.raise_for_status()
-    data   = resp.json()
+    data   = _get_json(url, session)
     items  = data.get("data", [])
     if not items:
         return (None, None, [])
 
     # Assume first match is the user we want
-    m                 = items[0]
+    return _membership_identifiers(items[0])
+
+
+def _membership_identifiers(m):
+    """Return (org_membership_id, user_id, team_ids) for an organization-membership resource."""
     org_membership_id = m.get("id")
-    user_id           = m.get("relationships", {}).get("user", {}).get("data", {}).get("id")
-    team_entries      = m.get("relationships", {}).get("teams", {}).get("data", []) or []
-    team_ids          = [t.get("id") for t in team_entries if t.get("id")]
+    rel               = m.get("relationships") or {}
+    # Index directly on the common path; missing or null links fall back to empty values
+    try:
+        user_id       = rel["user"]["data"]["id"]
+    except (KeyError, TypeError):
+        user_id       = None
+    try:
+        team_entries  = rel["teams"]["data"] or []
+    except (KeyError, TypeError):
+        team_entries  = []
+    team_ids          = [t["id"] for t in team_entries if t and t.get("id")]
 
     return (org_membership_id, user_id, team_ids)
 
 
-def remove_org_memberships_from_team(team_id, org_membership_ids, team_name):
+def find_users_and_teams(org, emails, session=None, pool=None):
+    """Collect (org_membership_id, user_id, team_ids) for many emails at once.
+
+    Instead of one ?q=<email> search per email, queries
+    GET /organizations/{org}/organization-memberships?filter[email]=<a>,<b>,...
+    with up to MEMBERSHIPS_PAGE_SIZE emails per request (result pages fetched
+    concurrently) and matches attributes.email case-insensitively.
+    A single email keeps using find_user_and_team.
+
+    Returns {email: (org_membership_id, user_id, team_ids)}; emails without a
+    membership map to (None, None, []).
+    """
+    if len(emails) == 1:
+        return {emails[0]: find_user_and_team(org, emails[0], session)}
+
+    by_email = {}
+    for i in range(0, len(emails), MEMBERSHIPS_PAGE_SIZE):
+        chunk  = ",".join(quote_plus(e) for e in emails[i:i + MEMBERSHIPS_PAGE_SIZE])
+        url    = f"{API_BASE}/organizations/{org}/organization-memberships?filter[email]={chunk}"
+        for m in _get_all_pages(url, MEMBERSHIPS_PAGE_SIZE, session, pool):
+            member_email = ((m.get("attributes", {}) or {}).get("email") or "").lower()
+            if member_email:
+                by_email.setdefault(member_email, m)
+
+    lookups = {}
+    for email in emails:
+        m = by_email.get(email.lower())
+        lookups[email] = _membership_identifiers(m) if m else (None, None, [])
+    return lookups
+
+
+def _retry_after_seconds(resp):
+    """Seconds to wait after a 429, from Retry-After or X-RateLimit-Reset (default 1)."""
+    headers = getattr(resp, "headers", None) or {}
+    for name in ("Retry-After", "X-RateLimit-Reset"):
+        try:
+            return min(max(float(headers[name]), 0.0), 60.0)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return 1.0
+
+
+def remove_org_memberships_from_team(team_id, org_membership_ids, team_name, session=None):
     """Bulk remove organization-memberships from a team using relationships endpoint.
 
     Endpoint: DELETE /api/v2/teams/{team_id}/relationships/organization-memberships
@@ -111,17 +356,18 @@ def remove_org_memberships_from_team(team_id, org_membership_ids, team_name):
         "data": [{"type": "organization-memberships", "id": oid} for oid in org_membership_ids]
     }
 
+    session = session or SESSION
     try:
-        resp = requests.delete(url, headers=HEADERS, json=payload)
+        resp = session.delete(url, json=payload)
+        # Only wait when TFE asks us to back off, then retry
+        for _ in range(RATE_LIMIT_RETRIES):
+            if resp.status_code != 429:
+                break
+            time.sleep(_retry_after_seconds(resp))
+            resp = session.delete(url, json=payload)
     except Exception as e:
         return (False, 0, str(e))
 
-    # Wait 3 seconds after the request as requested
-    try:
-        time.sleep(3)
-    except Exception:
-        pass
-
     if resp.status_code == 204:
         return (True, resp.status_code, "")
     return (False, resp.status_code, getattr(resp, "text", ""))
@@ -230,89 +476,98 @@ def main():
         print("No valid emails provided. Use --email/--emails and/or -f, --emails-file, --file.")
         sys.exit(1)
 
-    # Step 2: find the team by name in org teams once
-    teams               = get_org_teams(args.org)
-    target_team         = None
-    for t in teams:
-        if (t.get("attributes", {}) or {}).get("name") == args.team:
-            target_team = t
-            break
-
-    if not target_team:
-        print(f"Team '{args.team}' not found in organization '{args.org}'.")
-        sys.exit(2)
-
-    team_id                  = target_team.get("id")
-    attrs                    = target_team.get("attributes", {}) or {}
-    users_count              = attrs.get("users-count")
-    visibility               = attrs.get("visibility")
-
-    overall_status           = 0
-    membership_ids_to_remove = []  # Collect valid org_membership_ids for removal in one request
-    email_by_membership_id   = {}
-
-    # Part 1: Process each email
-    print("\n ************* Processing Users details and retrieving their TFE data ****************")
-    for email in emails:
-        logger.info(f"\n♻️️️️️️ Processing email: {email}")
-
-        # Step 1: find user and collect their team ids
-        org_membership_id, user_id, user_team_ids = find_user_and_team(args.org, email)
+    # One session and one worker pool for the whole run; both are closed on exit
+    with build_session() as session, ThreadPoolExecutor(max_workers=PAGE_WORKERS) as pool:
+        # Step 2: find the team by name once
+        target_team         = get_team_by_name(args.org, args.team, session, pool)
+
+        if not target_team:
+            print(f"Team '{args.team}' not found in organization '{args.org}'.")
+            sys.exit(2)
+
+        team_id                  = target_team.get("id")
+        attrs                    = target_team.get("attributes", {}) or {}
+        users_count              = attrs.get("users-count")
+        visibility               = attrs.get("visibility")
+        # Team details are the same for every user; format them once
+        team_details             = (
+            f" - team_name: {args.team}\n"
+            f" - team_id: {team_id}\n"
+            f" - users-count: {users_count}\n"
+            f" - visibility: {visibility}"
+        )
+
+        overall_status           = 0
+        membership_ids_to_remove = []  # Collect valid org_membership_ids for removal in one request
+        email_by_membership_id   = {}
+
+        # Step 1: look up all emails up front in batched requests
+        lookups = find_users_and_teams(args.org, emails, session, pool)
+
+        # Part 1: Process each email
+        print("\n ************* Processing Users details and retrieving their TFE data ****************")
+        for email in emails:
+            logger.info("\n♻️️️️️️ Processing email: %s", email)
+
+            org_membership_id, user_id, user_team_ids = lookups[email]
+
+            if not org_membership_id:
+                logger.error("  ❌ User with email '%s' not found in organization '%s'.", email, args.org)
+                overall_status = max(overall_status, 1)
+                continue
 
-        if not org_membership_id:
-            logger.error(f"  ❌ User with email '{email}' not found in organization '{args.org}'.")
-            overall_status = max(overall_status, 1)
-            continue
+            # Step 3: check whether user belongs to the specified team
+            if team_id in user_team_ids:
+                logger.info(
+                    "\n  User belongs to team:\n"
+                    " - email: %s\n"
+                    " - user_id: %s\n"
+                    " - org_membership_id: %s\n"
+                    "%s",
+                    email, user_id, org_membership_id, team_details,
+                )
+                # queue for bulk removal
+                membership_ids_to_remove.append(org_membership_id)
+                email_by_membership_id[org_membership_id] = email
+            else:
+                logger.info(
+                    "\n User and team exist, but user is not a member of the specified team '%s':\n"
+                    " - email: %s\n"
+                    " - user_id: %s\n"
+                    " - org_membership_id: %s\n"
+                    "%s",
+                    args.team, email, user_id, org_membership_id, team_details,
+                )
+                overall_status = max(overall_status, 3)
 
-        # Step 3: check whether user belongs to the specified team
-        if team_id in set(user_team_ids):
-            logger.info(
-                "\n  User belongs to team:\n"
-                f" - email: {email}\n"
-                f" - user_id: {user_id}\n"
-                f" - org_membership_id: {org_membership_id}\n"
-                f" - team_name: {args.team}\n"
-                f" - team_id: {team_id}\n"
-                f" - users-count: {users_count}\n"
-                f" - visibility: {visibility}"
-            )
-            # queue for bulk removal
-            membership_ids_to_remove.append(org_membership_id)
-            email_by_membership_id[org_membership_id] = email
-        else:
-            logger.info(
-                f"\n User and team exist, but user is not a member of the specified team '{args.team}':\n"
-                f" - email: {email}\n"
-                f" - user_id: {user_id}\n"
-                f" - org_membership_id: {org_membership_id}\n"
-                f" - team_name: {args.team}\n"
-                f" - team_id: {team_id}\n"
-                f" - users-count: {users_count}\n"
-                f" - visibility: {visibility}"
+        # Part 2: Perform a single bulk delete request for all queued users
+        if membership_ids_to_remove:
+            print("\n ************* Starting removal process for all users from TFE ****************")
+            ok, status_code, resp_text = remove_org_memberships_from_team(
+                team_id, membership_ids_to_remove, args.team, session
             )
-            overall_status = max(overall_status, 3)
-
-    # Part 2: Perform a single bulk delete request for all queued users
-    if membership_ids_to_remove:
-        print("\n ************* Starting removal process for all users from TFE ****************")
-        ok, status_code, resp_text = remove_org_memberships_from_team(team_id, membership_ids_to_remove, args.team)
-        if ok:
-            for oid in membership_ids_to_remove:
-                email = email_by_membership_id.get(oid, "<unknown>")
-                logger.info(
-                    f"\n ✅ User '{email}' with organization-membership '{oid}' successfully removed from team '{args.team}'."
+            if ok:
+                for oid in membership_ids_to_remove:
+                    email = email_by_membership_id.get(oid, "<unknown>")
+                    logger.info(
+                        "\n ✅ User '%s' with organization-membership '%s' successfully removed from team '%s'.",
+                        email, oid, args.team,
+                    )
+            else:
+                overall_status = max(overall_status, 4)
+                # An unknown team or rejected payload suggests the cached team id is stale
+                if status_code in (404, 422):
+                    invalidate_org_teams_cache(args.org)
+                logger.error(
+                    "Failed to remove users from team in bulk request:\n"
+                    " - team_name: %s\n"
+                    " - team_id: %s\n"
+                    " - status_code: %s\n"
+                    " - response: %s",
+                    args.team, team_id, status_code, resp_text,
                 )
         else:
-            overall_status = max(overall_status, 4)
-            logger.error(
-                "Failed to remove users from team in bulk request:\n"
-                f" - team_name: {args.team}\n"
-                f" - team_id: {team_id}\n"
-                f" - status_code: {status_code}\n"
-                f" - response: {resp_text}"
-            )
-    else:
-        logger.warning(f"\n 🌝 No valid Users found to be removed from the team '{args.team}'...")
+            logger.warning("\n 🌝 No valid Users found to be removed from the team '%s'...", args.team)
 
 
     print("\n ⭐⭐⭐*********** Operation completed successfully!!! *************⭐⭐⭐ \n")
@@ -1,4 +1,5 @@
 import importlib
+import json
 import sys
 from types import SimpleNamespace
 
@@ -7,24 +8,53 @@ import pytest
 
 
 class MockResponse:
-    def __init__(self, status_code=200, json_data=None, text=""):
+    def __init__(self, status_code=200, json_data=None, text="", headers=None):
         self.status_code = status_code
         self._json = json_data or {}
         self.text = text
+        self.headers = headers or {}
 
     def json(self):
         return self._json
 
+    @property
+    def content(self):
+        return json.dumps(self._json).encode("utf-8")
+
     def raise_for_status(self):
         # Mimic requests raising for 4xx/5xx
         if 400 <= self.status_code:
             raise Exception(f"HTTP {self.status_code}")
 
 
+class FakeSession:
+    """Stand-in for a requests.Session routing get/delete to the given callables."""
+    def __init__(self, get=None, delete=None):
+        self.get = get
+        self.delete = delete
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def use_fake_session(monkeypatch, main_mod, **handlers):
+    # Cover both the default session and the one main() builds for its run
+    session = FakeSession(**handlers)
+    monkeypatch.setattr(main_mod, "SESSION", session)
+    monkeypatch.setattr(main_mod, "build_session", lambda: session)
+
+
 @pytest.fixture(autouse=True)
 def env_token_and_host(monkeypatch):
     monkeypatch.setenv("TFE_HOST", "https://app.terraform.io")
     monkeypatch.setenv("TFE_TOKEN", "test-token")
+    monkeypatch.delenv("TFE_TEAMS_CACHE_TTL", raising=False)
     yield
 
 
@@ -41,12 +71,26 @@ def main_mod(monkeypatch):
     return main_module
 
 
+def test_invalid_cache_ttl_exits(monkeypatch, capsys):
+    monkeypatch.setenv("TFE_TEAMS_CACHE_TTL", "60s")
+    if "main" in sys.modules:
+        del sys.modules["main"]
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+
+    with pytest.raises(SystemExit) as e:
+        import main  # noqa: F401
+    assert e.value.code == 1
+    assert "TFE_TEAMS_CACHE_TTL" in capsys.readouterr().err
+
+
 def test_find_user_and_team_success(monkeypatch, main_mod):
     org = "acme"
     email = "user@example.com"
 
     # Mock GET for organization-memberships and teams
-    def fake_get(url, headers):
+    def fake_get(url):
         if "/organization-memberships" in url:
             assert "q=user%40example.com" in url  # email should be URL-encoded
             return MockResponse(200, {
@@ -68,7 +112,7 @@ def test_find_user_and_team_success(monkeypatch, main_mod):
             })
         raise AssertionError(f"Unexpected GET url: {url}\n")
 
-    monkeypatch.setattr(main_mod, "requests", SimpleNamespace(get=fake_get))
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
 
     org_membership_id, user_id, team_ids = main_mod.find_user_and_team(org, email)
     assert org_membership_id == "ou-1"
@@ -76,9 +120,161 @@ def test_find_user_and_team_success(monkeypatch, main_mod):
     assert team_ids == ["team-123"]
 
 
+def test_find_user_and_team_null_relationships(monkeypatch, main_mod):
+    def fake_get(url):
+        return MockResponse(200, {
+            "data": [
+                {
+                    "id": "ou-1",
+                    "relationships": {"user": {"data": None}, "teams": {"data": None}},
+                }
+            ]
+        })
+
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
+
+    assert main_mod.find_user_and_team("acme", "user@example.com") == ("ou-1", None, [])
+    assert main_mod._membership_identifiers(
+        {"id": "ou-1", "relationships": {"user": {"data": {"id": "user-1"}}, "teams": {"data": [None, {"id": "team-123"}]}}}
+    ) == ("ou-1", "user-1", ["team-123"])
+
+
+def test_get_org_teams_fetches_remaining_pages(monkeypatch, main_mod):
+    requested = []
+
+    def fake_get(url):
+        requested.append(url)
+        if url.endswith("/organizations/acme/teams"):
+            return MockResponse(200, {
+                "data": [{"id": "team-1"}],
+                "meta": {"pagination": {"current-page": 1, "page-size": 1, "total-pages": 3}},
+            })
+        if "page[number]=2&page[size]=1" in url:
+            return MockResponse(200, {"data": [{"id": "team-2"}]})
+        if "page[number]=3&page[size]=1" in url:
+            return MockResponse(200, {"data": [{"id": "team-3"}]})
+        raise AssertionError(f"Unexpected GET url: {url}")
+
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
+
+    teams = main_mod.get_org_teams("acme")
+    assert [t["id"] for t in teams] == ["team-1", "team-2", "team-3"]
+    assert len(requested) == 3
+
+
+def test_get_org_teams_memoized_per_org_across_sessions(monkeypatch, main_mod):
+    calls = {"get": 0}
+
+    def fake_get(url):
+        calls["get"] += 1
+        return MockResponse(200, {"data": [{"id": "team-123", "attributes": {"name": "owners"}}]})
+
+    s1, s2 = FakeSession(get=fake_get), FakeSession(get=fake_get)
+    p1, p2 = object(), object()
+
+    first = main_mod.get_org_teams("acme", s1, p1)
+    second = main_mod.get_org_teams("acme", s2, p2)
+    assert first == second
+    assert calls["get"] == 1
+
+    first.clear()  # callers get their own list
+    assert main_mod.get_org_teams("acme") == second
+
+
+def test_get_org_teams_reuses_disk_cache(tmp_path, monkeypatch, main_mod):
+    calls = {"get": 0}
+
+    def fake_get(url):
+        calls["get"] += 1
+        return MockResponse(200, {"data": [{"id": "team-123", "attributes": {"name": "owners"}}]})
+
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
+    monkeypatch.setattr(main_mod, "TEAMS_CACHE_TTL", 60)
+    monkeypatch.setattr(main_mod, "TEAMS_CACHE_DIR", str(tmp_path))
+
+    first = main_mod.get_org_teams("acme")
+    main_mod._ORG_TEAMS.clear()  # force the on-disk path
+    second = main_mod.get_org_teams("acme")
+    assert first == second
+    assert calls["get"] == 1
+    assert (tmp_path / "acme.json").exists()
+
+    main_mod.get_org_teams("other")
+    main_mod.invalidate_org_teams_cache("acme")
+    assert not (tmp_path / "acme.json").exists()
+    assert "other" in main_mod._ORG_TEAMS
+    assert "acme" not in main_mod._ORG_TEAMS
+    main_mod.get_org_teams("acme")
+    assert calls["get"] == 3  # acme, other, acme again after invalidation
+
+
+def test_find_users_and_teams_batches_lookup(monkeypatch, main_mod):
+    requested = []
+
+    def fake_get(url):
+        requested.append(url)
+        assert "filter[email]=user1%40example.com,user2%40example.com,ghost%40example.com" in url
+        return MockResponse(200, {
+            "data": [
+                {
+                    "id": "ou-1",
+                    "attributes": {"email": "User1@Example.com"},
+                    "relationships": {"user": {"data": {"id": "user-1"}}, "teams": {"data": [{"id": "team-123"}]}},
+                },
+                {
+                    "id": "ou-2",
+                    "attributes": {"email": "user2@example.com"},
+                    "relationships": {"user": {"data": {"id": "user-2"}}, "teams": {"data": []}},
+                },
+            ],
+            "meta": {"pagination": {"current-page": 1, "page-size": 100, "total-pages": 1}},
+        })
+
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
+
+    lookups = main_mod.find_users_and_teams("acme", ["user1@example.com", "user2@example.com", "ghost@example.com"])
+    assert lookups == {
+        "user1@example.com": ("ou-1", "user-1", ["team-123"]),
+        "user2@example.com": ("ou-2", "user-2", []),
+        "ghost@example.com": (None, None, []),
+    }
+    assert len(requested) == 1
+    assert "page[size]=100" in requested[0]
+
+
+def test_get_team_by_name_uses_filter(monkeypatch, main_mod):
+    requested = []
+
+    def fake_get(url):
+        requested.append(url)
+        return MockResponse(200, {
+            "data": [{"id": "team-123", "attributes": {"name": "owners", "users-count": 4, "visibility": "secret"}}]
+        })
+
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
+
+    team = main_mod.get_team_by_name("acme", "owners")
+    assert team["id"] == "team-123"
+    assert team["attributes"]["users-count"] == 4
+    assert requested == [f"{main_mod.API_BASE}/organizations/acme/teams?filter[names]=owners&page[size]=1"]
+
+
+def test_get_team_by_name_empty_filter_result(monkeypatch, main_mod):
+    requested = []
+
+    def fake_get(url):
+        requested.append(url)
+        return MockResponse(200, {"data": []})
+
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
+
+    assert main_mod.get_team_by_name("acme", "owners") is None
+    assert len(requested) == 1  # no fallback to the full teams listing
+
+
 def test_main_user_in_team_and_bulk_remove_success(monkeypatch, capsys, main_mod):
     # Prepare mocks
-    def fake_get(url, headers):
+    def fake_get(url):
         if "/organization-memberships" in url:
             return MockResponse(200, {
                 "data": [
@@ -102,19 +298,13 @@ def test_main_user_in_team_and_bulk_remove_success(monkeypatch, capsys, main_mod
     # Capture the DELETE call and assert payload
     delete_calls = {}
 
-    def fake_delete(url, headers, json):
+    def fake_delete(url, json):
         delete_calls["url"] = url
         delete_calls["json"] = json
         return MockResponse(204)
 
-    # Avoid waiting 3 seconds
-    def fake_sleep(_):
-        return None
-
     # Patch
-    monkeypatch.setattr(main_mod, "requests", SimpleNamespace(get=fake_get, delete=fake_delete))
-    import time as _time
-    monkeypatch.setattr(main_mod, "time", SimpleNamespace(sleep=fake_sleep))
+    use_fake_session(monkeypatch, main_mod, get=fake_get, delete=fake_delete)
 
     # Run main with arguments
     argv = [
@@ -138,15 +328,55 @@ def test_main_user_in_team_and_bulk_remove_success(monkeypatch, capsys, main_mod
     }
 
 
+def test_remove_retries_after_rate_limit(monkeypatch, main_mod):
+    responses = [MockResponse(429, headers={"Retry-After": "2"}), MockResponse(204)]
+    slept = []
+
+    def fake_delete(url, json):
+        return responses.pop(0)
+
+    use_fake_session(monkeypatch, main_mod, delete=fake_delete)
+    monkeypatch.setattr(main_mod, "time", SimpleNamespace(sleep=slept.append))
+
+    ok, status_code, _ = main_mod.remove_org_memberships_from_team("team-123", ["ou-1"], "owners")
+    assert ok is True
+    assert status_code == 204
+    assert slept == [2.0]
+
+
+def test_main_invalidates_teams_cache_only_on_stale_team_errors(monkeypatch, main_mod):
+    def fake_get(url):
+        if "/organization-memberships" in url:
+            return MockResponse(200, {
+                "data": [{"id": "ou-1", "relationships": {"user": {"data": {"id": "user-1"}}, "teams": {"data": [{"id": "team-123"}]}}}]
+            })
+        if "/teams" in url:
+            return MockResponse(200, {"data": [{"id": "team-123", "attributes": {"name": "owners"}}]})
+        raise AssertionError(f"Unexpected GET url: {url}")
+
+    invalidated = []
+    monkeypatch.setattr(main_mod, "invalidate_org_teams_cache", invalidated.append)
+    monkeypatch.setattr(main_mod, "time", SimpleNamespace(sleep=lambda _: None))
+    monkeypatch.setattr(sys, "argv", ["main.py", "--org", "acme", "--team", "owners", "--email", "user@example.com"])
+
+    for status_code, expected in ((429, []), (404, ["acme"])):
+        invalidated.clear()
+        use_fake_session(monkeypatch, main_mod, get=fake_get, delete=lambda url, json: MockResponse(status_code))
+        with pytest.raises(SystemExit) as e:
+            main_mod.main()
+        assert e.value.code == 4
+        assert invalidated == expected
+
+
 def test_main_team_not_found(monkeypatch, main_mod):
-    def fake_get(url, headers):
+    def fake_get(url):
         if "/organization-memberships" in url:
             return MockResponse(200, {"data": [{"id": "ou-1", "relationships": {"user": {"data": {"id": "user-1"}}, "teams": {"data": []}}}]})
         if "/teams" in url:
             return MockResponse(200, {"data": [{"id": "team-999", "attributes": {"name": "not-owners"}}]})
         raise AssertionError(f"Unexpected GET url: {url}")
 
-    monkeypatch.setattr(main_mod, "requests", SimpleNamespace(get=fake_get))
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
 
     argv = ["main.py", "--org", "acme", "--team", "owners", "--email", "user@example.com"]
     monkeypatch.setattr(sys, "argv", argv)
@@ -157,14 +387,14 @@ def test_main_team_not_found(monkeypatch, main_mod):
 
 
 def test_main_user_not_found(monkeypatch, main_mod):
-    def fake_get(url, headers):
+    def fake_get(url):
         if "/organization-memberships" in url:
             return MockResponse(200, {"data": []})
         if "/teams" in url:
             return MockResponse(200, {"data": [{"id": "team-123", "attributes": {"name": "owners"}}]})
         raise AssertionError(f"Unexpected GET url: {url}")
 
-    monkeypatch.setattr(main_mod, "requests", SimpleNamespace(get=fake_get))
+    use_fake_session(monkeypatch, main_mod, get=fake_get)
 
     argv = ["main.py", "--org", "acme", "--team", "owners", "--email", "user@example.com"]
     monkeypatch.setattr(sys, "argv", argv)
@@ -175,7 +405,7 @@ def test_main_user_not_found(monkeypatch, main_mod):
 
 
 def test_main_user_not_in_team(monkeypatch, main_mod):
-    def fake_get(url, headers):
+    def fake_get(url):
         if "/organization-memberships" in url:
             return MockResponse(200, {
                 "data": [
@@ -189,11 +419,11 @@ def test_main_user_not_in_team(monkeypatch, main_mod):
     # Track if delete was called (shouldn't be)
     called = {"delete": False}
 
-    def fake_delete(url, headers, json):
+    def fake_delete(url, json):
         called["delete"] = True
         return MockResponse(204)
 
-    monkeypatch.setattr(main_mod, "requests", SimpleNamespace(get=fake_get, delete=fake_delete))
+    use_fake_session(monkeypatch, main_mod, get=fake_get, delete=fake_delete)
 
     argv = ["main.py", "--org", "acme", "--team", "owners", "--email", "user@example.com"]
     monkeypatch.setattr(sys, "argv", argv)
@@ -214,12 +444,14 @@ def test_emails_file_parsing(tmp_path, monkeypatch, main_mod):
     p = tmp_path / "emails.txt"
     p.write_text(content, encoding="utf-8")
 
-    def fake_get(url, headers):
+    def fake_get(url):
         if "/organization-memberships" in url:
-            # Return a membership for all users with a consistent team id
+            # One batched lookup returns a membership for every user with a consistent team id
             return MockResponse(200, {
                 "data": [
-                    {"id": "ou-X", "relationships": {"user": {"data": {"id": "user-X"}}, "teams": {"data": [{"id": "team-123"}]}}}
+                    {"id": f"ou-{n}", "attributes": {"email": f"user{n}@example.com"},
+                     "relationships": {"user": {"data": {"id": f"user-{n}"}}, "teams": {"data": [{"id": "team-123"}]}}}
+                    for n in (1, 2, 3)
                 ]
             })
         if "/teams" in url:
@@ -228,16 +460,11 @@ def test_emails_file_parsing(tmp_path, monkeypatch, main_mod):
 
     delete_calls = {"payloads": []}
 
-    def fake_delete(url, headers, json):
+    def fake_delete(url, json):
         delete_calls["payloads"].append(json)
         return MockResponse(204)
 
-    # Avoid waiting 3 seconds
-    def fake_sleep(_):
-        return None
-
-    monkeypatch.setattr(main_mod, "requests", SimpleNamespace(get=fake_get, delete=fake_delete))
-    monkeypatch.setattr(main_mod, "time", SimpleNamespace(sleep=fake_sleep))
+    use_fake_session(monkeypatch, main_mod, get=fake_get, delete=fake_delete)
 
     argv = [
         "main.py", "--org", "acme", "--team", "owners", "--emails-file", str(p)